@@ -156,6 +156,19 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Cache (shared by web and Celery workers so invalidation is seen by both)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+}
+
+# CSV import
+# Rows per INSERT ... ON CONFLICT statement. On PostgreSQL gains flatten out
+# around 10k rows; other backends may benefit from larger batches.
+CSV_IMPORT_BATCH_SIZE = config('CSV_IMPORT_BATCH_SIZE', default=10000, cast=int)
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -0,0 +1,31 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction; building the
+    # indexes this way doesn't block writes to the product table
+    atomic = False
+
+    dependencies = [
+        ('products', '0002_webhook'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='product',
+            index=GinIndex(OpClass(django.db.models.functions.text.Upper('sku'), name='gin_trgm_ops'), name='product_sku_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=GinIndex(OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='product_name_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=GinIndex(OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), name='product_desc_trgm'),
+        ),
+    ]
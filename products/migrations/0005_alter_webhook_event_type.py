@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_alter_webhook_event_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhook',
+            name='event_type',
+            field=models.CharField(choices=[('product.created', 'Product Created'), ('product.updated', 'Product Updated'), ('product.deleted', 'Product Deleted'), ('product.bulk_imported', 'Products Bulk Imported'), ('product.bulk_deleted', 'Products Bulk Deleted')], help_text='Event that triggers this webhook', max_length=50),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 
 class Product(models.Model):
@@ -18,6 +20,13 @@ class Product(models.Model):
                 name='unique_lower_sku'
             )
         ]
+        # Trigram indexes for the list filters; icontains compiles to
+        # UPPER(col) LIKE UPPER(...), so the indexes are on UPPER(col)
+        indexes = [
+            GinIndex(OpClass(Upper('sku'), name='gin_trgm_ops'), name='product_sku_trgm'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_trgm'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='product_desc_trgm'),
+        ]
     
     def save(self, *args, **kwargs):
         # Convert SKU to uppercase for consistency
@@ -34,6 +43,8 @@ class Webhook(models.Model):
         ('product.created', 'Product Created'),
         ('product.updated', 'Product Updated'),
         ('product.deleted', 'Product Deleted'),
+        ('product.bulk_imported', 'Products Bulk Imported'),
+        ('product.bulk_deleted', 'Products Bulk Deleted'),
     ]
     
     name = models.CharField(max_length=255, help_text='Friendly name for this webhook')
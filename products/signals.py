@@ -1,7 +1,42 @@
+from django.core.cache import cache
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Product, Webhook
-from .tasks import send_webhook
+from .tasks import send_webhooks_bulk
+
+# Seconds to cache the active webhook URLs for an event type
+WEBHOOK_CACHE_TIMEOUT = 300
+
+
+def _webhook_cache_key(event_type):
+    return f'webhooks:{event_type}'
+
+
+def get_webhook_urls(event_type):
+    """
+    Return target URLs of active webhooks for event_type, cached until
+    any webhook changes.
+    """
+    return cache.get_or_set(
+        _webhook_cache_key(event_type),
+        lambda: list(
+            Webhook.objects.filter(event_type=event_type, is_active=True)
+            .values_list('target_url', flat=True)
+        ),
+        WEBHOOK_CACHE_TIMEOUT
+    )
+
+
+def dispatch_webhooks(event_type, product_data):
+    """
+    Enqueue deliveries for all active webhooks subscribed to event_type.
+    """
+    urls = get_webhook_urls(event_type)
+    if not urls:
+        return
+    
+    # A single task posts to every endpoint concurrently
+    send_webhooks_bulk.delay(urls, event_type, product_data)
 
 
 @receiver(post_save, sender=Product)
@@ -12,9 +47,6 @@ def product_saved(sender, instance, created, **kwargs):
     # Determine event type
     event_type = 'product.created' if created else 'product.updated'
     
-    # Get all active webhooks for this event
-    webhooks = Webhook.objects.filter(event_type=event_type, is_active=True)
-    
     # Prepare product data
     product_data = {
         'id': instance.id,
@@ -27,8 +59,7 @@ def product_saved(sender, instance, created, **kwargs):
     }
     
     # Send webhook for each configured endpoint
-    for webhook in webhooks:
-        send_webhook.delay(webhook.target_url, event_type, product_data)
+    dispatch_webhooks(event_type, product_data)
 
 
 @receiver(post_delete, sender=Product)
@@ -38,9 +69,6 @@ def product_deleted(sender, instance, **kwargs):
     """
     event_type = 'product.deleted'
     
-    # Get all active webhooks for this event
-    webhooks = Webhook.objects.filter(event_type=event_type, is_active=True)
-    
     # Prepare product data (limited since object is being deleted)
     product_data = {
         'id': instance.id,
@@ -49,5 +77,13 @@ def product_deleted(sender, instance, **kwargs):
     }
     
     # Send webhook for each configured endpoint
-    for webhook in webhooks:
-        send_webhook.delay(webhook.target_url, event_type, product_data)
+    dispatch_webhooks(event_type, product_data)
+
+
+@receiver(post_save, sender=Webhook)
+@receiver(post_delete, sender=Webhook)
+def webhook_changed(sender, instance, **kwargs):
+    """
+    Invalidate cached webhook URLs when a webhook is added, edited or removed.
+    """
+    cache.delete_many([_webhook_cache_key(event) for event, _ in Webhook.EVENT_CHOICES])
@@ -1,16 +1,126 @@
+import asyncio
+import contextlib
 import csv
 import os
+import tempfile
+import time
+import httpx
+import requests
 from celery import shared_task
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from .models import Product
 
 
+# Minimum seconds between progress updates written to the result backend
+PROGRESS_UPDATE_INTERVAL = 0.5
+
+# Values of the CSV 'active' column treated as true
+_TRUTHY = frozenset({'true', '1', 'yes', 'active'})
+
+# Shared HTTP session for webhook deliveries. Celery workers are long-lived,
+# so pooled keep-alive connections are reused across tasks.
+_webhook_adapter = HTTPAdapter(
+    pool_maxsize=32,
+    # Retry connect errors, 502 and 503 only. Read timeouts and 504 are not
+    # retried, as the receiver may already have accepted the POST, and the
+    # final status is returned rather than raised.
+    max_retries=Retry(
+        total=2,
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=[502, 503],
+        allowed_methods=frozenset(['POST']),
+        raise_on_status=False
+    )
+)
+_session = requests.Session()
+_session.mount('https://', _webhook_adapter)
+_session.mount('http://', _webhook_adapter)
+
+
+def _upsert_batch(rows, batch_size):
+    """
+    Insert or update one batch of (sku, name, description, active) tuples
+    in a single INSERT ... ON CONFLICT (sku) DO UPDATE statement.
+    """
+    # Timestamps are set once in the SELECT rather than repeated in every
+    # VALUES row, keeping the statement to the CSV data itself
+    sql = (
+        f'INSERT INTO {Product._meta.db_table} '
+        '(sku, name, description, active, created_at, updated_at) '
+        'SELECT v.sku, v.name, v.description, v.active, now(), now() '
+        'FROM (VALUES %s) AS v (sku, name, description, active) '
+        'ON CONFLICT (sku) DO UPDATE SET name = EXCLUDED.name, '
+        'description = EXCLUDED.description, active = EXCLUDED.active, '
+        'updated_at = EXCLUDED.updated_at'
+    )
+    
+    with connection.cursor() as cursor:
+        execute_values(cursor.cursor, sql, rows, page_size=batch_size)
+
+
+def _copy_products(staging_file):
+    """
+    Load rows written to staging_file with PostgreSQL COPY.
+    
+    Rows go into a temporary staging table first so duplicate SKUs in the
+    CSV collapse to their last occurrence, matching the batch upsert path.
+    """
+    table = Product._meta.db_table
+    staging_file.seek(0)
+    
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE product_import_staging ('
+            'sku text, name text, description text, active boolean, row_num integer'
+            ') ON COMMIT DROP'
+        )
+        cursor.copy_expert(
+            'COPY product_import_staging (sku, name, description, active, row_num) '
+            'FROM STDIN WITH (FORMAT csv)',
+            staging_file
+        )
+        # Empty unquoted CSV fields arrive as NULL, hence the COALESCE
+        cursor.execute(
+            f'INSERT INTO {table} (sku, name, description, active, created_at, updated_at) '
+            "SELECT DISTINCT ON (sku) sku, name, COALESCE(description, ''), active, now(), now() "
+            'FROM product_import_staging ORDER BY sku, row_num DESC '
+            'ON CONFLICT (sku) DO UPDATE SET name = EXCLUDED.name, '
+            'description = EXCLUDED.description, active = EXCLUDED.active, '
+            'updated_at = EXCLUDED.updated_at'
+        )
+
+
 @shared_task(bind=True)
-def process_csv_upload(self, file_path):
+def process_csv_upload(self, file_path, batch_size=None, durable=True):
     """
     Process CSV file and import products into the database.
     Supports up to 500,000 rows with progress tracking.
+    
+    batch_size defaults to settings.CSV_IMPORT_BATCH_SIZE.
+    
+    With durable=True each batch of an upsert import commits on its own.
+    With durable=False the whole import runs in one transaction with
+    synchronous_commit off: far fewer WAL fsyncs, but the import is
+    all-or-nothing and a server crash right after it finishes can lose it,
+    so the CSV must be re-run.
+    
+    Imports into an empty table use COPY and are always all-or-nothing,
+    whatever durable is set to: the whole file is loaded in one transaction.
     """
+    from django.db.models.signals import post_save, post_delete
+    from .signals import product_saved, product_deleted, dispatch_webhooks
+    
+    # The raw SQL paths don't send model signals, but keep per-row webhooks
+    # off in case any code path here ends up saving individual instances;
+    # a single product.bulk_imported webhook is sent at the end instead
+    post_save.disconnect(product_saved, sender=Product)
+    post_delete.disconnect(product_deleted, sender=Product)
+    staging_file = None
     try:
         # Update state to parsing
         self.update_state(
@@ -22,131 +132,140 @@ def process_csv_upload(self, file_path):
             }
         )
         
-        # First pass: count total rows
-        with open(file_path, 'r', encoding='utf-8-sig') as csvfile:
-            total_rows = sum(1 for row in csvfile) - 1  # Exclude header
+        # Process in batches for efficiency. Rows are streamed in a single
+        # pass and upserted per batch, so memory stays proportional to the
+        # batch size rather than the whole table.
+        # PostgreSQL sees little benefit past ~10k rows per statement.
+        if batch_size is None:
+            batch_size = getattr(settings, 'CSV_IMPORT_BATCH_SIZE', 10000)
+        products_to_upsert = {}
         
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'current': 0,
-                'total': total_rows,
-                'status': f'Found {total_rows} products to process...'
-            }
-        )
+        # An empty table takes the COPY fast path: rows are spooled to a
+        # temporary file and loaded in one statement
+        use_copy = not Product.objects.exists()
+        if use_copy:
+            staging_file = tempfile.TemporaryFile(mode='w+', newline='', encoding='utf-8')
+            staging_writer = csv.writer(staging_file)
         
-        # Process in batches for efficiency
-        batch_size = 1000
-        products_to_create = []
-        products_to_update = []
-        existing_skus = {}
+        import_transaction = contextlib.nullcontext() if durable else transaction.atomic()
         
-        # Get all existing SKUs (case-insensitive)
-        for product in Product.objects.all():
-            existing_skus[product.sku.upper()] = product
-        
-        with open(file_path, 'r', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
+        with import_transaction, open(file_path, 'r', encoding='utf-8-sig') as csvfile:
+            if not durable:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL synchronous_commit = off')
+            
+            reader = csv.reader(csvfile)
+            header = [field.lower().strip() for field in next(reader, [])]
             
             # Validate CSV headers
             required_fields = {'sku', 'name', 'description', 'active'}
-            csv_fields = {field.lower().strip() for field in reader.fieldnames}
+            csv_fields = set(header)
             
             if not required_fields.issubset(csv_fields):
                 missing = required_fields - csv_fields
                 raise ValueError(f'Missing required CSV columns: {", ".join(missing)}')
             
+            # Resolve column positions once instead of building a dict per row
+            idx_sku = header.index('sku')
+            idx_name = header.index('name')
+            idx_description = header.index('description')
+            idx_active = header.index('active')
+            min_width = max(idx_sku, idx_name, idx_description, idx_active) + 1
+            # Bound once to skip method lookups in the row loop
+            strip = str.strip
+            upper = str.upper
+            lower = str.lower
+            
             current_row = 0
+            imported_rows = 0
+            last_update = time.monotonic()
             
             for row in reader:
                 current_row += 1
                 
-                # Update progress every 100 rows
-                if current_row % 100 == 0:
+                # Update progress at most every 500 ms so result backend
+                # writes don't scale with the row rate
+                now = time.monotonic()
+                if now - last_update > PROGRESS_UPDATE_INTERVAL:
+                    last_update = now
                     self.update_state(
                         state='PROGRESS',
                         meta={
                             'current': current_row,
-                            'total': total_rows,
-                            'status': f'Processing row {current_row} of {total_rows}...'
+                            'total': 0,
+                            'status': f'Processing row {current_row}...'
                         }
                     )
                 
+                # Skip blank or truncated rows
+                if len(row) < min_width:
+                    continue
+                
                 # Parse row data
-                sku = row.get('sku', '').strip().upper()
-                name = row.get('name', '').strip()
-                description = row.get('description', '').strip()
-                active_str = row.get('active', '').strip().lower()
+                sku = upper(strip(row[idx_sku]))
+                name = strip(row[idx_name])
+                description = strip(row[idx_description])
+                active_str = lower(strip(row[idx_active]))
                 
                 # Skip empty rows
                 if not sku or not name:
                     continue
                 
+                imported_rows += 1
+                
                 # Parse active field
-                active = active_str in ('true', '1', 'yes', 'active')
+                active = active_str in _TRUTHY
                 
-                # Check if product exists (case-insensitive)
-                if sku in existing_skus:
-                    # Update existing product
-                    product = existing_skus[sku]
-                    product.name = name
-                    product.description = description
-                    product.active = active
-                    products_to_update.append(product)
-                else:
-                    # Create new product
-                    product = Product(
-                        sku=sku,
-                        name=name,
-                        description=description,
-                        active=active
-                    )
-                    products_to_create.append(product)
-                    existing_skus[sku] = product
+                if use_copy:
+                    staging_writer.writerow((sku, name, description, active, current_row))
+                    continue
+                
+                # Keyed by SKU so a duplicate later in the batch wins;
+                # ON CONFLICT cannot touch the same row twice in one statement
+                products_to_upsert[sku] = (sku, name, description, active)
                 
                 # Process batch
-                if len(products_to_create) + len(products_to_update) >= batch_size:
-                    with transaction.atomic():
-                        if products_to_create:
-                            Product.objects.bulk_create(products_to_create, ignore_conflicts=False)
-                        if products_to_update:
-                            Product.objects.bulk_update(
-                                products_to_update,
-                                ['name', 'description', 'active', 'updated_at']
-                            )
-                    
-                    products_to_create = []
-                    products_to_update = []
+                if len(products_to_upsert) >= batch_size:
+                    _upsert_batch(list(products_to_upsert.values()), batch_size)
+                    products_to_upsert = {}
             
             # Process remaining products
-            if products_to_create or products_to_update:
+            if products_to_upsert:
                 self.update_state(
                     state='PROGRESS',
                     meta={
                         'current': current_row,
-                        'total': total_rows,
+                        'total': 0,
                         'status': 'Saving final batch to database...'
                     }
                 )
                 
-                with transaction.atomic():
-                    if products_to_create:
-                        Product.objects.bulk_create(products_to_create, ignore_conflicts=False)
-                    if products_to_update:
-                        Product.objects.bulk_update(
-                            products_to_update,
-                            ['name', 'description', 'active', 'updated_at']
-                        )
+                _upsert_batch(list(products_to_upsert.values()), batch_size)
+            
+            if use_copy:
+                self.update_state(
+                    state='PROGRESS',
+                    meta={
+                        'current': current_row,
+                        'total': 0,
+                        'status': 'Loading products into database...'
+                    }
+                )
+                
+                _copy_products(staging_file)
+        
+        # Notify subscribers once for the whole import
+        dispatch_webhooks('product.bulk_imported', {'count': imported_rows})
         
         # Clean up the uploaded file
         if os.path.exists(file_path):
             os.remove(file_path)
         
         return {
-            'current': total_rows,
-            'total': total_rows,
+            'current': current_row,
+            'total': current_row,
             'status': 'Import completed successfully!',
-            'result': f'Processed {total_rows} products'
+            'result': f'Processed {current_row} products'
         }
         
     except Exception as e:
@@ -160,6 +279,12 @@ def process_csv_upload(self, file_path):
         # Don't manually set FAILURE state - let Celery handle it automatically
         # Just raise the exception and Celery will properly store it
         raise
+    
+    finally:
+        post_save.connect(product_saved, sender=Product)
+        post_delete.connect(product_deleted, sender=Product)
+        if staging_file is not None:
+            staging_file.close()
 
 
 
@@ -167,8 +292,11 @@ def process_csv_upload(self, file_path):
 def send_webhook_test(target_url, webhook_name):
     """
     Send a test webhook with sample payload.
+    
+    The session may retry connect errors and 502/503 responses, so the
+    call can take several times the per-attempt timeout. Run it on a worker
+    and poll for the result; never call it inline from a request.
     """
-    import requests
     from datetime import datetime
     
     payload = {
@@ -182,23 +310,34 @@ def send_webhook_test(target_url, webhook_name):
     }
     
     try:
-        response = requests.post(
+        response = _session.post(
             target_url,
             json=payload,
             headers={'Content-Type': 'application/json'},
-            timeout=10
+            # (connect, read): connect-error retries fail fast
+            timeout=(3, 10)
         )
         return f'{response.status_code} {response.reason}'
     except requests.exceptions.RequestException as e:
         return f'Error: {str(e)}'
 
 
+async def _post_webhooks(urls, payload):
+    # Retry connect errors only; a POST that reached the receiver is never
+    # re-sent
+    transport = httpx.AsyncHTTPTransport(http2=True, retries=2)
+    async with httpx.AsyncClient(http2=True, timeout=10, transport=transport) as client:
+        return await asyncio.gather(
+            *(client.post(url, json=payload) for url in urls),
+            return_exceptions=True
+        )
+
+
 @shared_task
-def send_webhook(target_url, event_type, product_data):
+def send_webhooks_bulk(urls, event_type, product_data):
     """
-    Send webhook notification for product events.
+    Send one product event to several webhook endpoints concurrently.
     """
-    import requests
     from datetime import datetime
     
     payload = {
@@ -207,21 +346,22 @@ def send_webhook(target_url, event_type, product_data):
         'data': product_data
     }
     
-    try:
-        response = requests.post(
-            target_url,
-            json=payload,
-            headers={'Content-Type': 'application/json'},
-            timeout=10
-        )
-        return {
-            'success': True,
-            'status_code': response.status_code,
-            'url': target_url
-        }
-    except requests.exceptions.RequestException as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'url': target_url
-        }
+    responses = asyncio.run(_post_webhooks(urls, payload))
+    
+    results = []
+    for url, response in zip(urls, responses):
+        if isinstance(response, httpx.HTTPError):
+            results.append({
+                'success': False,
+                'error': str(response),
+                'url': url
+            })
+        elif isinstance(response, Exception):
+            raise response
+        else:
+            results.append({
+                'success': True,
+                'status_code': response.status_code,
+                'url': url
+            })
+    return results
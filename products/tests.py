@@ -1,3 +1,142 @@
-from django.test import TestCase
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .models import Product
+from .tasks import process_csv_upload
+from .views import CachedCountPaginator
+
+
+IMPORT_CSV = '\n'.join([
+    'SKU,Name,Description,Active',
+    'abc-1,First,Desc one,true',
+    'abc-2,Second,,false',
+    'abc-1,First again,Desc two,yes',
+    ',No sku,Skipped,true',
+    'abc-3',
+    '',
+    'abc-4,Fourth,Desc four,0',
+]) + '\n'
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProcessCsvUploadTests(TestCase):
+    def run_import(self, content=IMPORT_CSV, **kwargs):
+        fd, file_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8') as csvfile:
+            csvfile.write(content)
+
+        # Progress goes to the Celery result backend, which isn't needed here
+        with mock.patch.object(process_csv_upload, 'update_state'):
+            result = process_csv_upload(file_path, **kwargs)
+
+        self.assertFalse(os.path.exists(file_path))
+        return result
+
+    def assertImported(self):
+        products = {p.sku: p for p in Product.objects.filter(sku__startswith='ABC-')}
+        self.assertEqual(set(products), {'ABC-1', 'ABC-2', 'ABC-4'})
+
+        # Duplicate SKU keeps its last occurrence
+        self.assertEqual(products['ABC-1'].name, 'First again')
+        self.assertEqual(products['ABC-1'].description, 'Desc two')
+        self.assertTrue(products['ABC-1'].active)
+
+        # Empty description is stored as '' rather than NULL
+        self.assertEqual(products['ABC-2'].description, '')
+        self.assertFalse(products['ABC-2'].active)
+
+        self.assertFalse(products['ABC-4'].active)
+        return products
+
+    def test_copy_path_into_empty_table(self):
+        result = self.run_import()
+
+        products = self.assertImported()
+        self.assertIsNotNone(products['ABC-1'].created_at)
+        self.assertIsNotNone(products['ABC-1'].updated_at)
+        self.assertEqual(result['current'], 7)
+
+    def test_upsert_path_updates_existing_sku(self):
+        existing = Product.objects.create(sku='abc-2', name='Old', description='Old desc', active=True)
+
+        self.run_import()
+
+        products = self.assertImported()
+        self.assertEqual(products['ABC-2'].pk, existing.pk)
+        self.assertEqual(products['ABC-2'].name, 'Second')
+        self.assertEqual(products['ABC-2'].created_at, existing.created_at)
+
+    def test_upsert_path_duplicate_across_batches(self):
+        Product.objects.create(sku='ZZZ-1', name='Unrelated', description='', active=True)
+
+        self.run_import(batch_size=1)
+
+        self.assertImported()
+
+    def test_non_durable_import(self):
+        Product.objects.create(sku='abc-2', name='Old', description='Old desc', active=True)
+
+        self.run_import(durable=False)
+
+        self.assertImported()
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            self.run_import('sku,name\nabc-1,First\n')
+        self.assertFalse(Product.objects.exists())
+
+
+class CachedCountPaginatorTests(SimpleTestCase):
+    def make_paginator(self, actual, estimate):
+        paginator = CachedCountPaginator(range(actual), 50)
+        # Stand in for a pg_class.reltuples estimate
+        paginator.__dict__['count'] = estimate
+        paginator.count_is_estimate = True
+        return paginator
+
+    def test_over_estimate_clamps_to_real_last_page(self):
+        paginator = self.make_paginator(500000, 500123)
+        self.assertEqual(paginator.num_pages, 10003)
+
+        page = paginator.page(paginator.num_pages)
+
+        self.assertEqual(page.number, 10000)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.count, 500000)
+        self.assertEqual(paginator.num_pages, 10000)
+        self.assertFalse(paginator.count_is_estimate)
+
+    def test_over_estimate_page_between_real_and_estimated_end(self):
+        page = self.make_paginator(500000, 500123).page(10002)
+
+        self.assertEqual(page.number, 10000)
+        self.assertEqual(len(page.object_list), 50)
+        self.assertFalse(page.has_next())
+
+    def test_under_estimate_allows_pages_past_estimate(self):
+        page = self.make_paginator(25000, 20000).page(450)
+
+        self.assertEqual(page.number, 450)
+        self.assertEqual(page.paginator.num_pages, 500)
+
+    def test_under_estimate_last_estimated_page_has_next(self):
+        page = self.make_paginator(25000, 20000).page(400)
+
+        self.assertEqual(page.number, 400)
+        self.assertTrue(page.has_next())
+
+    def test_under_estimate_far_past_real_end(self):
+        page = self.make_paginator(25000, 20000).page(1000000)
+
+        self.assertEqual(page.number, 500)
+
+    def test_estimate_kept_away_from_the_end(self):
+        paginator = self.make_paginator(500000, 500123)
+
+        page = paginator.page(2)
+
+        self.assertEqual(page.number, 2)
+        self.assertTrue(paginator.count_is_estimate)
@@ -18,4 +18,5 @@ urlpatterns = [
     path('webhooks/<int:pk>/update/', views.WebhookUpdateView.as_view(), name='webhook_update'),
     path('webhooks/<int:pk>/delete/', views.WebhookDeleteView.as_view(), name='webhook_delete'),
     path('webhooks/<int:pk>/test/', views.test_webhook, name='webhook_test'),
+    path('webhooks/test/result/<str:task_id>/', views.get_webhook_test_result, name='webhook_test_result'),
 ]
@@ -1,10 +1,19 @@
+import hashlib
 import os
+import shutil
+import tempfile
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connection
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.db.models import Q
-from django.shortcuts import render
+from django.db.models.functions import Left
+from django.shortcuts import get_object_or_404, render
 from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from celery.result import AsyncResult
@@ -13,14 +22,110 @@ from .forms import ProductForm, ProductFilterForm, WebhookForm
 from .tasks import process_csv_upload
 
 
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that avoids running COUNT(*) on every page render.
+    
+    Unfiltered lists use PostgreSQL's row estimate from pg_class; filtered
+    lists cache the exact count per query for a short time. The estimate
+    never limits which pages can be reached: pages near or past the
+    estimated end switch to the exact count.
+    """
+    # Below this many rows an exact count is cheap and more accurate
+    ESTIMATE_THRESHOLD = 10000
+    # Pages within this fraction of the estimated end use the exact count
+    ESTIMATE_MARGIN = 0.1
+    CACHE_TIMEOUT = 30
+    CACHE_VERSION_KEY = 'products:count:version'
+    
+    count_is_estimate = False
+    
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        
+        if not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [query.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.ESTIMATE_THRESHOLD:
+                self.count_is_estimate = True
+                return row[0]
+            return self._exact_count()
+        
+        # The version is bumped by invalidate_counts() to drop all entries
+        version = cache.get_or_set(self.CACHE_VERSION_KEY, 1, None)
+        key = f'products:count:{version}:' + hashlib.md5(str(query).encode()).hexdigest()
+        return cache.get_or_set(key, self._exact_count, self.CACHE_TIMEOUT)
+    
+    @classmethod
+    def invalidate_counts(cls):
+        """Forget all cached filtered counts."""
+        try:
+            cache.incr(cls.CACHE_VERSION_KEY)
+        except ValueError:
+            pass  # Nothing cached yet
+    
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # The estimate may be low; only the exact count caps the range
+            if not self._use_exact_count():
+                raise
+            try:
+                return super().validate_number(number)
+            except EmptyPage:
+                # Still past the real end: show the last page instead
+                return self.num_pages
+    
+    def page(self, number):
+        page = super().page(number)
+        
+        # Near the estimated end the estimate decides Next/Last and may be
+        # high or low, so confirm with the exact count and clamp the page
+        # to the real end. A short page means the real end was reached.
+        near_end = page.end_index() >= self.count * (1 - self.ESTIMATE_MARGIN)
+        if self.count_is_estimate and (near_end or len(page.object_list) < self.per_page):
+            self._use_exact_count()
+            page = super().page(min(page.number, self.num_pages))
+        return page
+    
+    def _use_exact_count(self):
+        """
+        Replace an estimated count with the exact one.
+        Returns False if the count was already exact.
+        """
+        if not self.count_is_estimate:
+            return False
+        self.count_is_estimate = False
+        self.__dict__['count'] = self._exact_count()
+        self.__dict__.pop('num_pages', None)
+        return True
+    
+    def _exact_count(self):
+        return Paginator.count.func(self)
+
+
 class ProductListView(ListView):
     model = Product
     template_name = 'products/product_list.html'
     context_object_name = 'products'
     paginate_by = 50
+    paginator_class = CachedCountPaginator
     
     def get_queryset(self):
-        queryset = Product.objects.all().order_by('-created_at')
+        # Skip the full description TextField; the list only shows its
+        # first few words, so fetch a short prefix instead
+        queryset = (
+            Product.objects
+            .only('sku', 'name', 'active', 'created_at', 'updated_at')
+            .annotate(description_preview=Left('description', 200))
+            .order_by('-created_at')
+        )
         
         # Get filter parameters
         sku = self.request.GET.get('sku', '').strip()
@@ -112,11 +217,11 @@ def start_upload_task(request):
     upload_dir = os.path.join(settings.BASE_DIR, 'uploads')
     os.makedirs(upload_dir, exist_ok=True)
     
-    # Save file temporarily
-    file_path = os.path.join(upload_dir, f'upload_{uploaded_file.name}')
-    with open(file_path, 'wb+') as destination:
-        for chunk in uploaded_file.chunks():
-            destination.write(chunk)
+    # Save file temporarily under a generated name; the client-supplied
+    # filename is never used in the path
+    fd, file_path = tempfile.mkstemp(prefix='upload_', suffix='.csv', dir=upload_dir)
+    with os.fdopen(fd, 'wb') as destination:
+        shutil.copyfileobj(uploaded_file, destination, length=1 << 20)
     
     # Start the Celery task
     task = process_csv_upload.delay(file_path)
@@ -219,13 +324,25 @@ def bulk_delete_products(request):
     Bulk delete all products with confirmation step.
     GET: Show confirmation page
     POST: Delete all products
+    
+    The table is truncated, so no post_delete signals are sent; a single
+    product.bulk_deleted webhook is sent instead of product.deleted per row.
+    Ids are not reset, so new products never reuse an id subscribers saw.
     """
     if request.method == 'POST':
+        from .signals import dispatch_webhooks
+        
         # Get the count before deletion
         count = Product.objects.count()
         
         # Delete all products
-        Product.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {connection.ops.quote_name(Product._meta.db_table)}')
+        
+        CachedCountPaginator.invalidate_counts()
+        
+        # Notify subscribers once for the whole wipe
+        dispatch_webhooks('product.bulk_deleted', {'count': count})
         
         # Redirect to product list with success message
         from django.contrib import messages
@@ -239,6 +356,7 @@ def bulk_delete_products(request):
 
 
 # Webhook Views
+@method_decorator(ensure_csrf_cookie, name='dispatch')
 class WebhookListView(ListView):
     model = Webhook
     template_name = 'products/webhook_list.html'
@@ -276,26 +394,54 @@ class WebhookDeleteView(DeleteView):
     success_url = reverse_lazy('products:webhook_list')
 
 
+@require_http_methods(["POST"])
 def test_webhook(request, pk):
-    """Test a webhook by sending a sample payload."""
+    """
+    Queue a test webhook with a sample payload.
+    Returns the task_id so the client can poll for the result.
+    """
     from .tasks import send_webhook_test
-    from .models import Webhook
     
-    webhook = Webhook.objects.get(pk=pk)
+    webhook = get_object_or_404(Webhook, pk=pk)
     
-    # Send test webhook asynchronously
     task = send_webhook_test.delay(webhook.target_url, webhook.name)
     
-    # Wait for result (with timeout)
+    return JsonResponse({
+        'task_id': task.id,
+        'status': 'Test queued'
+    }, status=202)
+
+
+@require_http_methods(["GET"])
+def get_webhook_test_result(request, task_id):
+    """
+    Get the result of a webhook test task.
+    Always returns valid JSON, even on errors.
+    """
     try:
-        result = task.get(timeout=10)
-        from django.contrib import messages
-        messages.success(request, f'Test sent to {webhook.name}. Response: {result}')
+        task = AsyncResult(task_id)
+        
+        if task.state == 'SUCCESS':
+            response = {
+                'state': 'SUCCESS',
+                'result': task.result
+            }
+        elif task.state == 'FAILURE':
+            response = {
+                'state': 'FAILURE',
+                'result': f'Error: {task.info}'
+            }
+        else:
+            response = {
+                'state': task.state,
+                'result': ''
+            }
+        
+        return JsonResponse(response)
+        
     except Exception as e:
-        from django.contrib import messages
-        messages.error(request, f'Test failed: {str(e)}')
-    
-    return render(request, 'products/webhook_test_result.html', {
-        'webhook': webhook,
-        'result': result if 'result' in locals() else str(e)
-    })
+        # Catch any unexpected errors and return valid JSON
+        return JsonResponse({
+            'state': 'FAILURE',
+            'result': f'Error: {e}'
+        })